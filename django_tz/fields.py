@@ -1,5 +1,7 @@
 import pytz.tzinfo
 
+from django.core import validators
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils.encoding import smart_unicode, smart_str
 
@@ -19,11 +21,23 @@ class TimeZoneField(models.CharField):
             "choices": zones.ALL_TIMEZONE_CHOICES
         }
         defaults.update(kwargs)
-        return super(TimeZoneField, self).__init__(*args, **defaults)
+        super(TimeZoneField, self).__init__(*args, **defaults)
+        # choices property doesn't consume iterators passed as choices
+        choices = self._choices
+        if choices is not zones.ALL_TIMEZONE_CHOICES:
+            choices = self.choices
+        self.zone_names = zones.choice_values(choices)
 
     def validate(self, value, model_instance):
-        # coerce value back to a string to validate correctly
-        return super(TimeZoneField, self).validate(smart_str(value), model_instance)
+        # coerce value back to a string to validate correctly and check it
+        # against set of zone names instead of scanning choices
+        value = smart_str(value)
+        if not self.editable:
+            return
+        if self._choices and value and value not in self.zone_names:
+            raise ValidationError(self.error_messages['invalid_choice'] % value)
+        if not self.blank and value in validators.EMPTY_VALUES:
+            raise ValidationError(self.error_messages['blank'])
 
     def run_validators(self, value):
         # coerce value back to a string to validate correctly
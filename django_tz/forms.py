@@ -7,6 +7,7 @@ from django.core import validators
 from django.core.exceptions import ValidationError
 from django.forms.widgets import MultiWidget
 from django.forms.fields import MultiValueField, DateField, TimeField
+from django.utils.encoding import smart_unicode
 from django.utils.translation import ugettext_lazy as _
 
 from . import zones
@@ -20,6 +21,39 @@ class TimeZoneField(forms.TypedChoiceField):
         kwargs["coerce"] = coerce_timezone_value
         super(TimeZoneField, self).__init__(*args, **kwargs)
 
+    def _set_choices(self, value):
+        forms.TypedChoiceField._set_choices(self, value)
+        # value can be an already consumed iterator, so use stored copy
+        if value is not zones.ALL_TIMEZONE_CHOICES:
+            value = self._choices
+        self.zone_names = zones.choice_values(value)
+
+    choices = property(forms.TypedChoiceField._get_choices, _set_choices)
+
+    def valid_value(self, value):
+        return smart_unicode(value) in self.zone_names
+
+def validate_many(values, field=None):
+    """
+    Cleans many timezone names at once (e.g. during import) with given
+    TimeZoneField (or default one). Returns list of timezones or raises
+    ValidationError with messages for all invalid values.
+    """
+    field = field or TimeZoneField()
+    cleaned = {}
+    result, errors = [], []
+    for value in values:
+        if value not in cleaned:
+            try:
+                cleaned[value] = field.clean(value)
+            except ValidationError, e:
+                cleaned[value] = None
+                errors.extend(e.messages)
+        result.append(cleaned[value])
+    if errors:
+        raise ValidationError(errors)
+    return result
+
 class TimeZoneDateTimeWidget(MultiWidget):
     def decompress(self, value):
         if value:
@@ -3,6 +3,8 @@ try:
 except ImportError:
     from dummy_threading import currentThread
 
+import pytz
+
 from . import utils
 
 _active = {}
@@ -23,3 +25,106 @@ def get_timezone():
     from django.conf import settings
     return utils.coerce_timezone_value(settings.TIME_ZONE)
 
+def localize(value, from_timezone=None, tz=None):
+    """
+    Converts datetime value to given timezone (current global timezone by
+    default). Naive values are assumed to be in settings.TIME_ZONE (unless
+    from_timezone is given) and stay naive after conversion.
+    """
+    from django.conf import settings
+
+    with_tzinfo = value.tzinfo is not None
+    from_timezone = from_timezone or value.tzinfo or pytz.timezone(settings.TIME_ZONE)
+    value = utils.adjust_datetime_to_timezone(value, from_timezone, tz or get_timezone())
+    if with_tzinfo:
+        return value
+    return value.replace(tzinfo=None)
+
+class LocalizedDateTime(object):
+    """
+    Lazy version of localize. It remembers value and timezone which is active
+    during creation, but converts value only on first access (attribute
+    lookup, formatting, comparison etc.) and caches result. In templates it
+    behaves like converted datetime value. Filters which require real
+    datetime (e.g. timesince) should be given `localized` attribute.
+    """
+    __slots__ = ('_value', '_from_timezone', '_timezone', '_localized')
+
+    def __init__(self, value, from_timezone=None, tz=None):
+        self._value = value
+        self._from_timezone = from_timezone
+        self._timezone = tz or get_timezone()
+        self._localized = None
+
+    def _get_localized(self):
+        if self._localized is None:
+            self._localized = localize(self._value, self._from_timezone, self._timezone)
+        return self._localized
+    localized = property(_get_localized)
+
+    # original (not converted) value and its timezone
+    source = property(lambda self: self._value)
+    from_timezone = property(lambda self: self._from_timezone)
+
+    def __getattr__(self, name):
+        # unset slots (e.g. during unpickling) must not be delegated
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self._get_localized(), name)
+
+    def __reduce__(self):
+        return (LocalizedDateTime, (self._value, self._from_timezone, self._timezone))
+
+    def __str__(self):
+        return str(self._get_localized())
+
+    def __unicode__(self):
+        # render like datetime values are rendered in templates
+        from django.utils import formats
+        return formats.localize(self._get_localized())
+
+    def __repr__(self):
+        return '<LocalizedDateTime %r>' % (self._get_localized(),)
+
+    def __format__(self, format_spec):
+        return format(self._get_localized(), format_spec)
+
+    def __nonzero__(self):
+        return True
+
+    def __hash__(self):
+        return hash(self._get_localized())
+
+    def __eq__(self, other):
+        return self._get_localized() == _unwrap(other)
+
+    def __ne__(self, other):
+        return self._get_localized() != _unwrap(other)
+
+    def __lt__(self, other):
+        return self._get_localized() < _unwrap(other)
+
+    def __le__(self, other):
+        return self._get_localized() <= _unwrap(other)
+
+    def __gt__(self, other):
+        return self._get_localized() > _unwrap(other)
+
+    def __ge__(self, other):
+        return self._get_localized() >= _unwrap(other)
+
+    def __add__(self, other):
+        return self._get_localized() + other
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        return self._get_localized() - _unwrap(other)
+
+    def __rsub__(self, other):
+        return other - self._get_localized()
+
+def _unwrap(value):
+    if isinstance(value, LocalizedDateTime):
+        return value._get_localized()
+    return value
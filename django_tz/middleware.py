@@ -2,19 +2,26 @@ import datetime
 import pytz
 
 from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.utils.cache import patch_vary_headers
 from django.utils.translation import trans_real
 
 from . import global_tz
 from .forms import TimeZoneForm
-from .utils import guess_tz_from_lang
+from .utils import coerce_timezone_value, get_timezone_cache_key, guess_tz_from_lang
 
 def get_tz_from_request(request):
     if hasattr(request, 'session'):
         session_name = getattr(settings, 'TIMEZONE_SESSION_NAME', 'django_timezone')
         tz = request.session.get(session_name, None)
+        # sessions written by older versions contain tzinfo objects
         if tz and isinstance(tz, datetime.tzinfo):
             return tz
+        if tz:
+            try:
+                return coerce_timezone_value(tz)
+            except ValidationError:
+                pass
 
     cookie_name = getattr(settings, 'TIMEZONE_COOKIE_NAME', 'TIMEZONE')
     form = TimeZoneForm({'timezone': request.COOKIES.get(cookie_name, None)})
@@ -23,11 +30,28 @@ def get_tz_from_request(request):
 
     return None
 
+def get_cache_header():
+    """
+    Returns name of header with timezone cache key and its request.META key.
+    """
+    name = getattr(settings, 'TIMEZONE_CACHE_HEADER', 'X-Timezone')
+    return name, 'HTTP_' + name.upper().replace('-', '_')
+
 class GlobalTimezoneMiddleware(object):
     """
     This middleware guesses timezone from language and sets it in current
     thread global cache.
+
+    Resolved timezone is also stored in request.META as TIMEZONE_CACHE_HEADER
+    ('X-Timezone' by default) header and response varies on it, so django
+    cache middleware doesn't mix page versions for different timezones (put
+    this middleware after UpdateCacheMiddleware and before
+    FetchFromCacheMiddleware). Clients never send this header, so response
+    varies also on vary_headers - real request headers which timezone is
+    taken from - for downstream caches.
     """
+    vary_headers = ()
+
     def get_tz(self, request):
         raise NotImplementedError()
 
@@ -35,15 +59,28 @@ class GlobalTimezoneMiddleware(object):
         tz = self.get_tz(request)
         if tz:
             global_tz.activate(tz)
+        else:
+            # don't leak timezone of previous request handled by this thread
+            global_tz.deactivate()
+        meta_name = get_cache_header()[1]
+        request.META[meta_name] = get_timezone_cache_key(global_tz.get_timezone())
+
+    def process_exception(self, request, exception):
+        global_tz.deactivate()
 
     def process_response(self, request, response):
         global_tz.deactivate()
+        header_name, meta_name = get_cache_header()
+        if meta_name in request.META:
+            patch_vary_headers(response, (header_name,) + tuple(self.vary_headers))
         return response
 
 class TimezoneFromLangMiddleware(GlobalTimezoneMiddleware):
     """
     Not very smart middelware which guesses timezone from request lang setting.
     """
+    vary_headers = ('Cookie', 'Accept-Language')
+
     def get_tz(self, request):
         tz = get_tz_from_request(request)
         if tz:
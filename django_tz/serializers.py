@@ -0,0 +1,127 @@
+"""
+JSON serialization of timezone aware datetimes and timezones.
+
+Datetimes are localized to target timezone (current global timezone by
+default) and written as ISO-8601 strings with utc offset. Conversions go
+through adjust_datetime_to_timezone, which caches offsets between timezones
+per DST interval (see utils.OffsetCache), so serializing many values is
+cheap:
+
+    >>> response = HttpResponse(iter_json(meetups, ('id', 'start', 'timezone')),
+    ...                         mimetype='application/json')
+"""
+import datetime
+import re
+
+import pytz
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import simplejson
+
+from . import global_tz
+from .utils import adjust_datetime_to_timezone
+
+datetime_re = re.compile(
+    r'^(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2}):(\d{2})(?:\.(\d{1,6}))?'
+    r'(Z|[+-]\d{2}(?::?\d{2})?)$'
+)
+
+def _get_tz(tz):
+    if tz is None:
+        return global_tz.get_timezone()
+    if not hasattr(tz, 'localize'):
+        return pytz.timezone(tz)
+    return tz
+
+def format_datetime(value, tz=None, from_tz=None):
+    """
+    Returns ISO-8601 representation (with utc offset) of value localized to
+    tz. Naive values are assumed to be in from_tz (settings.TIME_ZONE by
+    default).
+    """
+    if value.tzinfo is None:
+        from_tz = from_tz or settings.TIME_ZONE
+    return adjust_datetime_to_timezone(value, from_tz, _get_tz(tz)).isoformat()
+
+def parse_datetime(value, tz=None):
+    """
+    Parses ISO-8601 string (with utc offset) back to aware datetime. If tz
+    is given result is converted to it, otherwise it has fixed offset tzinfo.
+    """
+    match = datetime_re.match(value)
+    if match is None:
+        raise ValueError("Invalid ISO-8601 datetime: %r" % value)
+    parts = match.groups()
+    microsecond = int(parts[6].ljust(6, '0')) if parts[6] else 0
+    result = datetime.datetime(*([int(p) for p in parts[:6]] + [microsecond]))
+    offset = parts[7]
+    minutes = 0
+    if offset != 'Z':
+        minutes = int(offset[1:3]) * 60 + int(offset[-2:] if len(offset) > 3 else 0)
+        if offset[0] == '-':
+            minutes = -minutes
+    if tz is None:
+        return pytz.FixedOffset(minutes).localize(result)
+    utc = result - datetime.timedelta(minutes=minutes)
+    return adjust_datetime_to_timezone(pytz.utc.localize(utc), None, _get_tz(tz))
+
+def serialize_value(value, tz=None):
+    """
+    Converts datetimes to localized ISO-8601 strings and timezones to
+    zone names. Other values are returned unchanged.
+    """
+    if isinstance(value, global_tz.LocalizedDateTime):
+        return format_datetime(value.source, tz, value.from_timezone)
+    if isinstance(value, datetime.datetime):
+        return format_datetime(value, tz)
+    if isinstance(value, datetime.tzinfo):
+        return getattr(value, 'zone', None) or str(value)
+    return value
+
+def iter_json(objects, fields, tz=None, chunk_size=100):
+    """
+    Returns iterator which yields JSON list of objects (model instances or
+    dicts) with given fields in chunks of chunk_size objects, so it can be
+    used as streamed response content. Timezone is resolved immediately, so
+    iterator can be consumed after global timezone is deactivated (e.g. by
+    WSGI server after middleware has finished).
+    """
+    return _iter_json(objects, fields, _get_tz(tz), chunk_size)
+
+def _iter_json(objects, fields, tz, chunk_size):
+    encoder = DjangoJSONEncoder()
+    yield '['
+    chunk = []
+    separator = ''
+    for obj in objects:
+        if isinstance(obj, dict):
+            data = dict((name, serialize_value(obj[name], tz)) for name in fields)
+        else:
+            data = dict((name, serialize_value(getattr(obj, name), tz)) for name in fields)
+        chunk.append(encoder.encode(data))
+        if len(chunk) >= chunk_size:
+            yield separator + ','.join(chunk)
+            separator = ','
+            chunk = []
+    if chunk:
+        yield separator + ','.join(chunk)
+    yield ']'
+
+def serialize(objects, fields, tz=None):
+    """
+    Returns JSON list of objects (see iter_json).
+    """
+    return ''.join(iter_json(objects, fields, tz))
+
+def loads(data, fields, tz=None):
+    """
+    Parses JSON list and converts values of given fields from ISO-8601
+    strings to datetimes (localized to tz if it is given).
+    """
+    result = simplejson.loads(data)
+    for obj in result:
+        for name in fields:
+            if obj.get(name):
+                obj[name] = parse_datetime(obj[name], tz)
+    return result
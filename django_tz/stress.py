@@ -0,0 +1,107 @@
+"""
+Concurrency stress harness for global timezone activation.
+
+It drives simulated requests through timezone middleware from a pool of
+threads and checks that no request sees timezone of another request and
+that global timezone store doesn't grow. It can be used from tests and for
+capacity planning:
+
+    >>> from django_tz import stress
+    >>> stats = stress.run(requests=100000, threads=32)
+    >>> stats['throughput'], stats['latency']['p99']
+"""
+from multiprocessing.pool import ThreadPool
+from timeit import default_timer
+
+import pytz
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+
+from . import global_tz
+from .middleware import TimezoneFromLangMiddleware
+
+class SimulatedError(Exception):
+    pass
+
+def percentile(values, percent):
+    """Returns percentile of already sorted list of values."""
+    if not values:
+        return None
+    index = int(round(percent / 100.0 * (len(values) - 1)))
+    return values[index]
+
+def run(requests=10000, threads=16, zones=None, failure_every=7, anonymous_every=5,
+        lookups=10, middleware_class=TimezoneFromLangMiddleware):
+    """
+    Runs stress test and returns dictionary with statistics.
+
+    Every failure_every-th request raises exception in the middle of view
+    (so process_response is not called) and every anonymous_every-th
+    request carries no timezone at all (so it should see default
+    settings.TIME_ZONE). get_timezone() is called lookups times per request
+    and its latency is measured.
+    """
+    zones = list(zones or pytz.common_timezones[::25])
+    session_name = getattr(settings, 'TIMEZONE_SESSION_NAME', 'django_timezone')
+    default_zone = global_tz.get_timezone().zone
+    middleware = middleware_class()
+    latencies = []
+    mismatches = []
+    failures = []
+    active_sizes = []
+
+    def handle(i):
+        request = HttpRequest()
+        if anonymous_every and i % anonymous_every == 0:
+            request.session = {}
+            expected = default_zone
+        else:
+            expected = zones[i % len(zones)]
+            request.session = {session_name: expected}
+        middleware.process_request(request)
+        try:
+            for unused in xrange(lookups):
+                start = default_timer()
+                tz = global_tz.get_timezone()
+                latencies.append(default_timer() - start)
+                # compare zone names - the same zone can be held by
+                # different (but equivalent) tzinfo instances
+                zone = getattr(tz, 'zone', None)
+                if zone != expected:
+                    mismatches.append((i, expected, zone))
+            active_sizes.append(len(global_tz._active))
+            if failure_every and i % failure_every == 0:
+                raise SimulatedError(i)
+        except SimulatedError, e:
+            failures.append(i)
+            middleware.process_exception(request, e)
+            return
+        middleware.process_response(request, HttpResponse())
+
+    pool = ThreadPool(threads)
+    start = default_timer()
+    try:
+        pool.map(handle, xrange(requests), chunksize=max(1, requests // (threads * 4)))
+    finally:
+        pool.close()
+        pool.join()
+    elapsed = default_timer() - start
+
+    latencies.sort()
+    return {
+        'requests': requests,
+        'threads': threads,
+        'elapsed': elapsed,
+        'throughput': requests / elapsed if elapsed else None,
+        'failures': len(failures),
+        'mismatches': mismatches,
+        'peak_active': max(active_sizes) if active_sizes else 0,
+        'final_active': len(global_tz._active),
+        'latency': {
+            'p50': percentile(latencies, 50),
+            'p90': percentile(latencies, 90),
+            'p99': percentile(latencies, 99),
+            'max': latencies[-1] if latencies else None,
+        },
+    }
@@ -1,20 +1,68 @@
-import pytz
+import hashlib
 
-from django.conf import settings
-from django.template import Node
+from django.core.cache import cache
+from django.template import Node, TemplateSyntaxError, Variable, VariableDoesNotExist
 from django.template import Library
+from django.utils.http import urlquote
 
-from django_tz.utils import adjust_datetime_to_timezone
 from django_tz import global_tz
+from django_tz.utils import get_timezone_cache_key
 
 register = Library()
 
 @register.filter
 def to_global_tz(value, from_timezone=None):
-    with_tzinfo = value.tzinfo is not None
-    from_timezone = from_timezone or value.tzinfo or pytz.timezone(settings.TIME_ZONE)
-    value = adjust_datetime_to_timezone(value, from_timezone, global_tz.get_timezone())
-    if with_tzinfo:
+    return global_tz.localize(value, from_timezone)
+
+@register.filter
+def to_global_tz_lazy(value, from_timezone=None):
+    """
+    Same as to_global_tz but conversion is postponed until value is
+    rendered (see global_tz.LocalizedDateTime).
+    """
+    if value is None:
+        return value
+    return global_tz.LocalizedDateTime(value, from_timezone)
+
+class TimezoneCacheNode(Node):
+    def __init__(self, nodelist, expire_time_var, fragment_name, vary_on):
+        self.nodelist = nodelist
+        self.expire_time_var = Variable(expire_time_var)
+        self.fragment_name = fragment_name
+        self.vary_on = [Variable(var) for var in vary_on]
+
+    def render(self, context):
+        try:
+            expire_time = self.expire_time_var.resolve(context)
+        except VariableDoesNotExist:
+            raise TemplateSyntaxError('"tz_cache" tag got an unknown variable: %r' % self.expire_time_var.var)
+        try:
+            expire_time = int(expire_time)
+        except (ValueError, TypeError):
+            raise TemplateSyntaxError('"tz_cache" tag got a non-integer timeout value: %r' % expire_time)
+        vary_on = [urlquote(var.resolve(context)) for var in self.vary_on]
+        vary_on.append(urlquote(get_timezone_cache_key(global_tz.get_timezone())))
+        args = hashlib.md5(u':'.join(vary_on).encode('utf-8'))
+        cache_key = 'template.cache.%s.%s' % (self.fragment_name, args.hexdigest())
+        value = cache.get(cache_key)
+        if value is None:
+            value = self.nodelist.render(context)
+            cache.set(cache_key, value, expire_time)
         return value
-    return value.replace(tzinfo=None)
 
+@register.tag
+def tz_cache(parser, token):
+    """
+    Works like django {% cache %} tag, but cached fragment varies also on
+    current global timezone:
+
+        {% tz_cache 500 sidebar request.user.username %}
+            ... localized content ...
+        {% endtz_cache %}
+    """
+    nodelist = parser.parse(('endtz_cache',))
+    parser.delete_first_token()
+    tokens = token.contents.split()
+    if len(tokens) < 3:
+        raise TemplateSyntaxError(u"'%r' tag requires at least 2 arguments." % tokens[0])
+    return TimezoneCacheNode(nodelist, tokens[1], tokens[2], tokens[3:])
@@ -1,5 +1,7 @@
 import BeautifulSoup
-from datetime import datetime
+import copy
+import pickle
+from datetime import datetime, timedelta
 
 import pytz
 
@@ -10,16 +12,20 @@ from django.contrib.auth.models import User
 from django.core.urlresolvers import reverse
 from django.db import models
 from django.forms.widgets import HiddenInput
-from django.http import HttpRequest
+from django.http import HttpRequest, HttpResponse
+from django.template import Context, Template
 from django.test import TestCase
+from django.utils import simplejson
 
 from .fields import TimeZoneField
 from . import forms as tz_forms
 from . import global_tz
 from . import middleware
+from . import serializers
+from . import stress
 from . import views
 
-from .utils import adjust_datetime_to_timezone
+from .utils import adjust_datetime_to_timezone, get_timezone_cache_key, OffsetCache, offset_cache
 
 #model for tests
 class Profile(models.Model):
@@ -65,6 +71,202 @@ class UtilsTestCase(TimeZoneTestCase):
         finally:
             global_tz.deactivate()
 
+class TemplateTagsTestCase(TimeZoneTestCase):
+    def test_lazy_filter_renders_like_eager_one(self):
+        context = Context({'value': datetime(2010, 10, 28, 19)})
+        global_tz.activate(pytz.timezone('Europe/Warsaw'))
+        try:
+            for template in ("{{ value|%s }}", "{{ value|%s|date:'Y-m-d H:i' }}",
+                             "{{ value|%s|time }}"):
+                eager = Template("{% load django_tz_tags %}" + template % 'to_global_tz')
+                lazy = Template("{% load django_tz_tags %}" + template % 'to_global_tz_lazy')
+                self.assertEqual(lazy.render(context), eager.render(context))
+        finally:
+            global_tz.deactivate()
+
+class OffsetCacheTestCase(TimeZoneTestCase):
+    def setUp(self):
+        super(OffsetCacheTestCase, self).setUp()
+        offset_cache.clear()
+
+    def convert(self, value, from_tz, to_tz):
+        if value.tzinfo is None:
+            value = from_tz.localize(value)
+        return to_tz.normalize(value.astimezone(to_tz))
+
+    def test_cached_conversions_across_dst(self):
+        warsaw = pytz.timezone('Europe/Warsaw')
+        denver = pytz.timezone('America/Denver')
+        value = datetime(2010, 1, 1)
+        while value < datetime(2011, 1, 1):
+            for from_tz, to_tz in ((warsaw, denver), (denver, warsaw)):
+                result = adjust_datetime_to_timezone(value, from_tz, to_tz)
+                expected = self.convert(value, from_tz, to_tz)
+                self.assertEqual(result, expected)
+                self.assertEqual(result.tzinfo, expected.tzinfo)
+            aware = warsaw.localize(value)
+            result = adjust_datetime_to_timezone(aware, None, denver)
+            self.assertEqual(result.tzinfo, self.convert(aware, None, denver).tzinfo)
+            value += timedelta(minutes=97)
+        info = offset_cache.info()
+        self.assertTrue(info.hits > info.misses * 10)
+
+    def test_bounded_size(self):
+        cache = OffsetCache(maxsize=2, windows=2)
+        for i in range(3):
+            cache.add(('A', 'B'), datetime(2010, 1, 1 + i), datetime(2010, 1, 2 + i),
+                      timedelta(hours=i), None)
+        self.assertEqual(cache.get(('A', 'B'), datetime(2010, 1, 1, 12)), None)
+        self.assertEqual(cache.get(('A', 'B'), datetime(2010, 1, 3, 12)), (timedelta(hours=2), None))
+        cache.add(('A', 'C'), datetime(2010, 1, 1), datetime(2010, 1, 2), timedelta(0), None)
+        cache.add(('A', 'D'), datetime(2010, 1, 1), datetime(2010, 1, 2), timedelta(0), None)
+        info = cache.info()
+        self.assertEqual(info.currsize, 2)
+        self.assertEqual(info.windows, 2)
+        self.assertEqual(info.evictions, 1)
+
+    def test_least_recently_used_pair_is_evicted(self):
+        cache = OffsetCache(maxsize=2)
+        for zone in ('B', 'C'):
+            cache.add(('A', zone), datetime(2010, 1, 1), datetime(2010, 1, 2), timedelta(0), None)
+        self.assertNotEqual(cache.get(('A', 'B'), datetime(2010, 1, 1, 12)), None)
+        cache.add(('A', 'D'), datetime(2010, 1, 1), datetime(2010, 1, 2), timedelta(0), None)
+        self.assertNotEqual(cache.get(('A', 'B'), datetime(2010, 1, 1, 12)), None)
+        self.assertEqual(cache.get(('A', 'C'), datetime(2010, 1, 1, 12)), None)
+
+class LocalizedDateTimeTestCase(TimeZoneTestCase):
+    def test_conversion_is_lazy(self):
+        value = global_tz.LocalizedDateTime(datetime(2010, 10, 28, 19),
+                                            tz=pytz.timezone('Europe/Warsaw'))
+        self.assertEqual(value._localized, None)
+        self.assertEqual(value.hour, 21)
+        self.assertEqual(value._localized, datetime(2010, 10, 28, 21))
+
+    def test_uses_timezone_active_during_creation(self):
+        global_tz.activate(pytz.timezone('Europe/Warsaw'))
+        try:
+            value = global_tz.LocalizedDateTime(datetime(2010, 10, 28, 19))
+        finally:
+            global_tz.deactivate()
+        self.assertEqual(str(value), "2010-10-28 21:00:00")
+
+    def test_behaves_like_datetime(self):
+        tz = pytz.timezone('Europe/Warsaw')
+        joined = datetime(2010, 10, 28, 19)
+        value = global_tz.LocalizedDateTime(joined, tz=tz)
+        expected = global_tz.localize(joined, tz=tz)
+        self.assertEqual(value, expected)
+        self.assertEqual(expected, value)
+        self.assertTrue(value > joined)
+        self.assertTrue(joined < value)
+        self.assertEqual(value.strftime("%H:%M"), "21:00")
+        self.assertEqual(value - expected, expected - expected)
+
+    def test_pickle_and_copy(self):
+        value = global_tz.LocalizedDateTime(datetime(2010, 10, 28, 19),
+                                            tz=pytz.timezone('Europe/Warsaw'))
+        for protocol in (0, 2):
+            restored = pickle.loads(pickle.dumps(value, protocol))
+            self.assertEqual(restored, value)
+        self.assertEqual(copy.deepcopy(value), value)
+
+class SerializersTestCase(TimeZoneTestCase):
+    def test_format_and_parse_datetime(self):
+        tz = pytz.timezone('Europe/Warsaw')
+        value = serializers.format_datetime(datetime(2010, 10, 28, 19), tz)
+        self.assertEqual(value, "2010-10-28T21:00:00+02:00")
+        self.assertEqual(serializers.parse_datetime(value), pytz.utc.localize(datetime(2010, 10, 28, 19)))
+        parsed = serializers.parse_datetime(value, 'Europe/Warsaw')
+        self.assertEqual(parsed.tzinfo.zone, 'Europe/Warsaw')
+        self.assertEqual(parsed.replace(tzinfo=None), datetime(2010, 10, 28, 21))
+        self.assertRaises(ValueError, serializers.parse_datetime, "2010-10-28 21:00")
+
+    def test_serialize_objects(self):
+        profiles = [Profile(name="Tomasz Rybarczyk", timezone="Europe/Warsaw",
+                            joined=datetime(2010, 1, 1, 12)) for i in range(3)]
+        chunks = list(serializers.iter_json(profiles, ('name', 'timezone', 'joined'),
+                                            tz='America/Denver', chunk_size=2))
+        self.assertEqual(len(chunks), 4)
+        data = serializers.loads(''.join(chunks), ('joined',), tz='UTC')
+        self.assertEqual(len(data), 3)
+        self.assertEqual(data[0]['timezone'], 'Europe/Warsaw')
+        self.assertEqual(data[0]['joined'], pytz.utc.localize(datetime(2010, 1, 1, 12)))
+
+    def test_serialize_localized_datetime(self):
+        value = global_tz.LocalizedDateTime(datetime(2010, 10, 28, 19),
+                                            tz=pytz.timezone('America/Denver'))
+        self.assertEqual(serializers.serialize([{'joined': value}], ('joined',), tz='Europe/Warsaw'),
+                         '[{"joined": "2010-10-28T21:00:00+02:00"}]')
+
+    def test_iter_json_uses_timezone_active_during_creation(self):
+        global_tz.activate(pytz.timezone('Europe/Warsaw'))
+        try:
+            chunks = serializers.iter_json([{'joined': datetime(2010, 10, 28, 19)}], ('joined',))
+        finally:
+            global_tz.deactivate()
+        data = simplejson.loads(''.join(chunks))
+        self.assertEqual(data[0]['joined'], "2010-10-28T21:00:00+02:00")
+
+class CacheTestCase(TimeZoneTestCase):
+    def test_middleware_varies_on_timezone(self):
+        request = HttpRequest()
+        request.session = {'django_timezone': 'Europe/Warsaw'}
+        mw = middleware.TimezoneFromLangMiddleware()
+        mw.process_request(request)
+        self.assertEqual(request.META['HTTP_X_TIMEZONE'], 'Europe/Warsaw')
+        response = mw.process_response(request, HttpResponse())
+        self.assertTrue('X-Timezone' in response['Vary'])
+        self.assertTrue('Cookie' in response['Vary'])
+        self.assertTrue('Accept-Language' in response['Vary'])
+
+    def test_timezone_cache_key_grouping(self):
+        winter = datetime(2011, 1, 15, 12)
+        def key(zone):
+            return get_timezone_cache_key(pytz.timezone(zone), group_by_offset=True, now=winter)
+        self.assertNotEqual(get_timezone_cache_key(pytz.timezone('Europe/Warsaw')),
+                            get_timezone_cache_key(pytz.timezone('Europe/Berlin')))
+        self.assertEqual(key('Europe/Warsaw'), key('Europe/Berlin'))
+        self.assertNotEqual(key('Europe/Warsaw'), key('Europe/London'))
+        # the same offset in winter, but only Denver changes it in summer
+        self.assertEqual(key('America/Phoenix')[:8], 'MST-0700')
+        self.assertEqual(key('America/Denver')[:8], 'MST-0700')
+        self.assertNotEqual(key('America/Phoenix'), key('America/Denver'))
+        # zone names are accepted too
+        self.assertEqual(get_timezone_cache_key('America/Denver', group_by_offset=True, now=winter),
+                         key('America/Denver'))
+
+    def test_tz_cache_tag(self):
+        template = Template("{% load django_tz_tags %}"
+                            "{% tz_cache 60 test_tz_cache_tag %}{{ value }}{% endtz_cache %}")
+        try:
+            global_tz.activate(pytz.timezone('Europe/Warsaw'))
+            self.assertEqual(template.render(Context({'value': 1})), '1')
+            self.assertEqual(template.render(Context({'value': 2})), '1')
+            global_tz.activate(pytz.timezone('America/Denver'))
+            self.assertEqual(template.render(Context({'value': 2})), '2')
+        finally:
+            global_tz.deactivate()
+
+class ConcurrencyTestCase(TimeZoneTestCase):
+    def test_middleware_under_concurrency(self):
+        requests = getattr(settings, 'TIMEZONE_STRESS_REQUESTS', 2000)
+        threads = getattr(settings, 'TIMEZONE_STRESS_THREADS', 8)
+        stats = stress.run(requests=requests, threads=threads)
+        self.assertEqual(stats['mismatches'], [])
+        self.assertTrue(stats['failures'] > 0)
+        self.assertTrue(stats['peak_active'] <= threads)
+        self.assertEqual(stats['final_active'], 0)
+
+    def test_request_without_timezone_doesnt_see_previous_one(self):
+        request = HttpRequest()
+        request.session = {'django_timezone': 'Europe/Warsaw'}
+        middleware.TimezoneFromLangMiddleware().process_request(request)
+        # previous request failed without process_response call
+        request = HttpRequest()
+        request.session = {}
+        middleware.TimezoneFromLangMiddleware().process_request(request)
+        self.assertEqual(global_tz.get_timezone(), pytz.timezone(settings.TIME_ZONE))
+
 class TimeZoneFieldTestCase(TimeZoneTestCase):
     def test_forms_clean_required(self):
         f = tz_forms.TimeZoneField()
@@ -89,6 +291,40 @@ class TimeZoneFieldTestCase(TimeZoneTestCase):
         except forms.ValidationError, e:
             self.assertEqual(e.messages, ["Select a valid choice. BAD VALUE is not one of the available choices."])
 
+    def test_forms_custom_choices(self):
+        f = tz_forms.TimeZoneField(choices=(("Europe/Warsaw", "Warsaw"),))
+        self.assertEqual(f.clean("Europe/Warsaw"), pytz.timezone("Europe/Warsaw"))
+        self.assertRaises(forms.ValidationError, f.clean, "US/Eastern")
+
+    def test_forms_choices_iterator(self):
+        f = tz_forms.TimeZoneField(choices=((z, z) for z in pytz.common_timezones))
+        self.assertEqual(f.clean("Europe/Warsaw"), pytz.timezone("Europe/Warsaw"))
+
+    def test_models_choices_iterator(self):
+        field = TimeZoneField(choices=((z, z) for z in pytz.common_timezones))
+        field.validate("Europe/Warsaw", None)
+        self.assertEqual(len(list(field.choices)), len(pytz.common_timezones))
+
+    def test_models_validate_without_choices(self):
+        TimeZoneField(choices=None).validate("Europe/Warsaw", None)
+
+    def test_forms_validate_many(self):
+        self.assertEqual(tz_forms.validate_many(["US/Eastern", "Europe/Warsaw", "US/Eastern"]),
+                         [pytz.timezone("US/Eastern"), pytz.timezone("Europe/Warsaw"),
+                          pytz.timezone("US/Eastern")])
+        try:
+            tz_forms.validate_many(["US/Eastern", "BAD VALUE"])
+        except forms.ValidationError, e:
+            self.assertEqual(e.messages, ["Select a valid choice. BAD VALUE is not one of the available choices."])
+        else:
+            self.fail("ValidationError not raised")
+
+    def test_models_validate(self):
+        field = Profile._meta.get_field('timezone')
+        field.validate(pytz.timezone("America/Denver"), None)
+        field.validate("America/Denver", None)
+        self.assertRaises(forms.ValidationError, field.validate, "BAD VALUE", None)
+
     def test_default_timezone_save(self):
         profile = Profile.objects.create(name='test', joined=datetime.now())
         self.assertEqual(profile.timezone, global_tz.get_timezone())
@@ -155,11 +391,35 @@ class ViewsTestCase(TimeZoneTestCase):
 
         tz_name_1 = 'Europe/Warsaw'
         self.client.post(reverse('django-tz-set-timezone'), data={'timezone': tz_name_1})
-        self.assertTrue(self.client.session['django_timezone'], pytz.timezone(tz_name_1))
+        self.assertEqual(self.client.session['django_timezone'], tz_name_1)
 
         tz_name_2 = 'America/Denver'
         self.client.post(reverse('django-tz-set-timezone'), data={'timezone': tz_name_2})
-        self.assertTrue(self.client.session['django_timezone'], pytz.timezone(tz_name_2))
+        self.assertEqual(self.client.session['django_timezone'], tz_name_2)
+
+    def test_set_timezone_with_ajax(self):
+        self.client.login(username='test', password='test')
+        response = self.client.post(reverse('django-tz-set-timezone'),
+                        data={'timezone': 'Europe/Warsaw'},
+                        HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.client.session['django_timezone'], 'Europe/Warsaw')
+
+        response = self.client.post(reverse('django-tz-set-timezone'),
+                        data={'timezone': 'BAD VALUE'},
+                        HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue('timezone' in simplejson.loads(response.content))
+
+    def test_get_tz_from_request_session(self):
+        request = HttpRequest()
+        request.session = {'django_timezone': 'Europe/Warsaw'}
+        self.assertEqual(middleware.get_tz_from_request(request),
+                         pytz.timezone('Europe/Warsaw'))
+        # value stored by older versions
+        request.session = {'django_timezone': pytz.timezone('America/Denver')}
+        self.assertEqual(middleware.get_tz_from_request(request),
+                         pytz.timezone('America/Denver'))
 
 
 class TimeZoneDateTimeFieldsTestCase(TimeZoneTestCase):
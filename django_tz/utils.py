@@ -1,22 +1,154 @@
+import bisect
+import datetime
+import threading
+from collections import namedtuple
+
 import pytz
 
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.utils.encoding import smart_str
 
+CacheInfo = namedtuple('CacheInfo', 'hits misses evictions maxsize currsize windows')
+
+# naive local values closer than this to any transition are not cached
+# (no utc offset change is bigger, so such values can't be ambiguous)
+TRANSITION_MARGIN = datetime.timedelta(days=2)
+
+def _shift(value, delta):
+    try:
+        return value + delta
+    except OverflowError:
+        return value
+
+def _transition_window(tz, utc_value):
+    """
+    Returns (start, end) range of naive UTC datetimes around utc_value in
+    which tz has constant utc offset.
+    """
+    times = getattr(tz, '_utc_transition_times', None)
+    if not times:
+        return datetime.datetime.min, datetime.datetime.max
+    i = bisect.bisect_right(times, utc_value)
+    start = times[i - 1] if i > 0 else datetime.datetime.min
+    end = times[i] if i < len(times) else datetime.datetime.max
+    return start, end
+
+class OffsetCache(object):
+    """
+    Cache of conversions between pairs of timezones. For every (from_zone,
+    to_zone) pair it remembers up to `windows` ranges of source values
+    together with offset delta and target tzinfo which are valid in them,
+    so conversion of cached value is one timedelta addition. At most
+    `maxsize` pairs are kept (the least recently used one is evicted first).
+    info() reports evictions and currsize in pairs and number of cached
+    ranges as windows.
+
+    Lookups are not locked, so hits/misses counters are approximate when
+    cache is used by many threads.
+    """
+    def __init__(self, maxsize=128, windows=8):
+        self.maxsize = maxsize
+        self.windows = windows
+        self._entries = {}
+        # last use "time" of every pair
+        self._used = {}
+        self._clock = 0
+        self._lock = threading.Lock()
+        self._last_key = None
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key, value):
+        for start, end, delta, tzinfo in self._entries.get(key, ()):
+            if start <= value < end:
+                self.hits += 1
+                if key != self._last_key:
+                    self._touch(key)
+                return delta, tzinfo
+        self.misses += 1
+        return None
+
+    def _touch(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._clock += 1
+                self._used[key] = self._clock
+            self._last_key = key
+
+    def add(self, key, start, end, delta, tzinfo):
+        if start >= end:
+            return
+        with self._lock:
+            windows = self._entries.get(key)
+            if windows is None:
+                windows = ()
+                if len(self._entries) >= self.maxsize:
+                    oldest = min(self._used, key=self._used.get)
+                    del self._entries[oldest]
+                    del self._used[oldest]
+                    self.evictions += 1
+            windows = ((start, end, delta, tzinfo),) + windows
+            self._entries[key] = windows[:self.windows]
+            self._clock += 1
+            self._used[key] = self._clock
+            self._last_key = key
+
+    def info(self):
+        return CacheInfo(self.hits, self.misses, self.evictions, self.maxsize,
+                         len(self._entries), sum(len(w) for w in self._entries.values()))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._used.clear()
+            self._last_key = None
+            self.hits = self.misses = self.evictions = 0
+
+offset_cache = OffsetCache()
+
 def adjust_datetime_to_timezone(value, from_tz, to_tz=None):
     """
     Given a ``datetime`` object adjust it according to the from_tz timezone
     string into the to_tz timezone string.
+
+    Offsets between timezones are cached together with ranges in which they
+    are valid (see OffsetCache), so most of conversions don't go through
+    localize/astimezone/normalize chain.
     """
     if to_tz is None:
         to_tz = settings.TIME_ZONE
+    tz = pytz.timezone(smart_str(to_tz))
     if value.tzinfo is None:
         if not hasattr(from_tz, "localize"):
             from_tz = pytz.timezone(smart_str(from_tz))
-        value = from_tz.localize(value)
-    tz = pytz.timezone(smart_str(to_tz))
-    return tz.normalize(value.astimezone(tz))
+        key = getattr(from_tz, 'zone', None), tz.zone
+        if key[0] is not None:
+            cached = offset_cache.get(key, value)
+            if cached is not None:
+                return (value + cached[0]).replace(tzinfo=cached[1])
+        local = from_tz.localize(value)
+        result = tz.normalize(local.astimezone(tz))
+        # nonexistent (skipped by dst transition) values are not cached
+        if key[0] is not None and from_tz.normalize(local).replace(tzinfo=None) == value:
+            offset = local.utcoffset()
+            utc = value - offset
+            start, end = _transition_window(from_tz, utc)
+            to_start, to_end = _transition_window(tz, utc)
+            offset_cache.add(key,
+                             _shift(_shift(max(start, to_start), offset), TRANSITION_MARGIN),
+                             _shift(_shift(min(end, to_end), offset), -TRANSITION_MARGIN),
+                             result.replace(tzinfo=None) - value, result.tzinfo)
+        return result
+
+    utc = value.replace(tzinfo=None) - value.utcoffset()
+    key = 'UTC', tz.zone
+    cached = offset_cache.get(key, utc)
+    if cached is not None:
+        return (utc + cached[0]).replace(tzinfo=cached[1])
+    result = tz.normalize(value.astimezone(tz))
+    start, end = _transition_window(tz, utc)
+    offset_cache.add(key, start, end, result.replace(tzinfo=None) - utc, result.tzinfo)
+    return result
 
 def coerce_timezone_value(value):
     try:
@@ -24,6 +156,42 @@ def coerce_timezone_value(value):
     except pytz.UnknownTimeZoneError:
         raise ValidationError("Unknown timezone")
 
+def format_utc_offset(offset, separator=''):
+    """
+    Returns utc offset (timedelta) in +HHMM form (or +HH:MM with ':'
+    separator).
+    """
+    minutes = offset.days * 24 * 60 + offset.seconds // 60
+    sign = '-' if minutes < 0 else '+'
+    return '%s%02d%s%02d' % (sign, abs(minutes) // 60, separator, abs(minutes) % 60)
+
+def get_timezone_cache_key(tz, group_by_offset=None, now=None):
+    """
+    Returns string which identifies timezone in cache keys. When
+    group_by_offset is true (settings.TIMEZONE_CACHE_GROUP_BY_OFFSET by
+    default) zones which have the same utc offset and abbreviation from now
+    until their next transition (at the same moment) share one key, and
+    the key changes at that transition. It is safe only when cached content
+    contains dates before the next transition - past dates and dates after
+    it can still be shifted differently in such zones. Grouping is done for
+    given moment `now` (naive UTC datetime, current time by default).
+    """
+    if group_by_offset is None:
+        group_by_offset = getattr(settings, 'TIMEZONE_CACHE_GROUP_BY_OFFSET', False)
+    if not group_by_offset:
+        return smart_str(getattr(tz, 'zone', None) or tz)
+    if not hasattr(tz, 'localize'):
+        # e.g. zone name guessed from language
+        tz = pytz.timezone(smart_str(tz))
+    utcnow = now or datetime.datetime.utcnow()
+    now = adjust_datetime_to_timezone(utcnow, 'UTC', tz)
+    next_transition = _transition_window(tz, utcnow)[1]
+    if next_transition == datetime.datetime.max:
+        next_transition = 'never'
+    else:
+        next_transition = next_transition.strftime('%Y%m%d%H%M')
+    return '%s%s-%s' % (now.tzname(), format_utc_offset(now.utcoffset()), next_transition)
+
 def guess_tz_from_lang(language_code):
     country_code = language_code.split('-', 1)[1] if '-' in language_code else language_code
     if country_code.upper() in pytz.country_timezones:
@@ -1,27 +1,41 @@
 # -*- coding:utf-8 -*-
 from django.conf import settings
-from django.http import HttpResponseRedirect
+from django.http import HttpResponse, HttpResponseRedirect
+from django.utils import simplejson
 
 from .forms import TimeZoneForm
 
 def set_timezone(request):
     """
     Nearly 1:1 copy of django.views.i18n.set_language, but it sets timezone not language.
+
+    Only zone name is stored in session (or cookie) and it is written only
+    when it differs from stored one. Ajax requests get empty 204 response
+    (or 400 response with JSON encoded form errors) instead of redirect.
     """
 
-    next = request.REQUEST.get('next', None)
-    if not next:
-        next = request.META.get('HTTP_REFERER', None)
-    if not next:
-        next = '/'
-    response = HttpResponseRedirect(next)
+    if request.is_ajax():
+        response = HttpResponse(status=204)
+    else:
+        next = request.REQUEST.get('next', None)
+        if not next:
+            next = request.META.get('HTTP_REFERER', None)
+        if not next:
+            next = '/'
+        response = HttpResponseRedirect(next)
     if request.method == 'POST':
         form = TimeZoneForm(request.POST)
         if form.is_valid():
+            zone = form.cleaned_data['timezone'].zone
             if hasattr(request, 'session'):
                 session_name = getattr(settings, 'TIMEZONE_SESSION_NAME', 'django_timezone')
-                request.session[session_name] = form.cleaned_data['timezone']
+                if request.session.get(session_name, None) != zone:
+                    request.session[session_name] = zone
             else:
                 cookie_name = getattr(settings, 'TIMEZONE_COOKIE_NAME', 'TIMEZONE')
-                response.set_cookie(cookie_name, form.cleaned_data['timezone'])
+                if request.COOKIES.get(cookie_name, None) != zone:
+                    response.set_cookie(cookie_name, zone)
+        elif request.is_ajax():
+            return HttpResponse(simplejson.dumps(form.errors), status=400,
+                                mimetype='application/json')
     return response
@@ -1,5 +1,23 @@
 from datetime import datetime
 import pytz
 
+from django.utils.encoding import smart_unicode
+
 ALL_TIMEZONE_CHOICES = tuple(zip(pytz.all_timezones, pytz.all_timezones))
 COMMON_TIMEZONE_CHOICES = tuple(zip(pytz.common_timezones, pytz.common_timezones))
+ALL_TIMEZONES = frozenset(pytz.all_timezones)
+
+def choice_values(choices):
+    """
+    Returns set of values of given (possibly grouped) choices, so they can be
+    validated without scanning choices list.
+    """
+    if choices is ALL_TIMEZONE_CHOICES:
+        return ALL_TIMEZONES
+    values = set()
+    for key, value in choices:
+        if isinstance(value, (list, tuple)):
+            values.update(smart_unicode(k) for k, v in value)
+        else:
+            values.add(smart_unicode(key))
+    return frozenset(values)